@@ -1,13 +1,297 @@
 import re
 import glob
 import os
-from datetime import datetime
+import mmap
+import multiprocessing
 from collections import defaultdict
+import numpy as np
+import matplotlib
+# Render straight to a file; this skips GUI toolkit setup entirely
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
+try:
+    # Optional: JIT-compiles the Setting/Set pairing loop when available
+    from numba import njit, types
+    from numba.typed import Dict
+except ImportError:
+    njit = None
+
 # --- Configuration ---
 LOG_FILE_PATTERN = "./logs/logfile_*rps.log"
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+GRAPH_OUTPUT_PATH = "latency_vs_rps.png"
+
+# Only requests that START within this window (relative to the first log
+# entry) are measured
+WINDOW_START_US = 30_000_000
+WINDOW_END_US = 80_000_000
+
+# Log entries up to this point are all parsed. After it, no new request can
+# start inside the window, so the rest of the log is only read for the
+# completions of requests that are still outstanding, and not at all once
+# every request that started in the window has completed.
+SCAN_CUTOFF_US = 85_000_000
+
+# Parsed latencies are cached in this directory, next to the log files.
+# Bump CACHE_VERSION whenever a change to parsing or pairing changes what
+# parse_log_file returns, so results from the old code are not reused.
+CACHE_DIR_NAME = ".cache"
+CACHE_VERSION = 2
+
+# Timestamp at the start of a log line. The trailing 'Z' is left out of the
+# group so numpy can parse it directly as a (naive UTC) datetime64.
+TIMESTAMP_REGEX = re.compile(
+    rb"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6})Z",
+    re.MULTILINE,
+)
+
+# Regex to capture the client part of a log entry. It starts with a literal,
+# so the regex engine can skip straight to candidate lines (most lines are
+# server output) instead of matching a line-anchored pattern on every line;
+# the timestamp is then read from the start of the matched line. A leading
+# (?<!\S) would break that fast literal search, so the whitespace required
+# before 'Client_' is checked by _iter_entries instead.
+# 'Setting' and 'Set' only differ by the 'ting' suffix, so the action is
+# captured as just the 't' of it: b't' for a start and None for a completion.
+ENTRY_REGEX = re.compile(
+    rb"Client_(\d+)\s+\[Req:\s+(\d+)\]\s+Set(?:(t)ing)?\s"
+)
+
+# One row per matched log entry, filled straight from the regex groups.
+# The action group becomes a bool directly (b't' -> True, None -> False).
+RECORD_DTYPE = np.dtype([
+    ('ts', 'S26'),
+    ('client', 'i8'),
+    ('req', 'i8'),
+    ('is_start', '?'),
+])
+
+def _ts_to_us(ts):
+    """Returns a TIMESTAMP_REGEX timestamp group (bytes) in microseconds."""
+    return int(np.datetime64(ts.decode('ascii'), 'us').astype(np.int64))
+
+def _find_cutoff_offset(data, start, cutoff_us):
+    """
+    Binary-searches the log buffer for the offset of the first timestamped
+    line at or after start whose timestamp is past cutoff_us, relying on
+    timestamps being in order. Returns len(data) if there is no such line.
+    """
+    lo, hi = start, len(data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        # Sample the first timestamped line starting at or after mid
+        match = TIMESTAMP_REGEX.search(data, mid)
+        if match is None or _ts_to_us(match[1]) > cutoff_us:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    match = TIMESTAMP_REGEX.search(data, lo)
+    return match.start() if match is not None else len(data)
+
+def _iter_entries(data, start, end):
+    """
+    Yields a (timestamp, client, req, is_start) row, matching RECORD_DTYPE,
+    for each log entry in data[start:end]. As with the original greedy,
+    line-anchored regex, 'Client_' must follow whitespace, lines
+    that do not start with a timestamp are skipped, and only the last entry
+    on a line counts. The groups are left as bytes; numpy converts them to
+    integers and datetimes in C when the record array is built.
+    """
+    # The whole buffer is scanned by one finditer, so this loop only runs
+    # once per entry; keep the per-entry work to a few C calls.
+    rfind = data.rfind
+    match_ts = TIMESTAMP_REGEX.match
+    row = None
+    row_line_start = -1
+    for entry in ENTRY_REGEX.finditer(data, start, end):
+        entry_start = entry.start()
+        if not data[entry_start - 1:entry_start].isspace():
+            continue
+        line_start = rfind(b'\n', 0, entry_start) + 1
+        if line_start == row_line_start:
+            # A later entry on the same line replaces the earlier one
+            if row is not None:
+                row = (row[0], entry[1], entry[2], entry[3])
+            continue
+        if row is not None:
+            yield row
+        ts = match_ts(data, line_start)
+        row = (ts[1], entry[1], entry[2], entry[3]) if ts is not None else None
+        row_line_start = line_start
+    if row is not None:
+        yield row
+
+def _record_columns(records):
+    """
+    Returns (ts_us, keys, is_start) arrays for a RECORD_DTYPE array, with
+    timestamps as integer microseconds.
+    Each request is identified by a single int64 instead of a (client, req)
+    pair, so pairing only has one key to sort, hash and compare. Request ids
+    are per-client counters and fit easily in the low 32 bits.
+    """
+    ts_us = records['ts'].astype('datetime64[us]').view(np.int64)
+    keys = (records['client'] << 32) | records['req']
+    return ts_us, keys, records['is_start']
+
+def _pending_start_keys(keys, is_start):
+    """
+    Returns the set of keys whose latest start has no completion after it.
+    After a stable sort by key, those are the starts that are the last entry
+    for their key.
+    """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    is_last = np.append(keys[1:] != keys[:-1], True)
+    return set(keys[is_last & is_start[order]].tolist())
+
+def _iter_late_completions(data, start, pending):
+    """
+    Yields the completion rows from offset start onwards for the requests in
+    pending (a set of keys), removing each key as it completes. Stops as soon
+    as pending is empty.
+    """
+    for row in _iter_entries(data, start, len(data)):
+        if row[3] is not None:
+            continue
+        key = (int(row[1]) << 32) | int(row[2])
+        if key in pending:
+            pending.remove(key)
+            yield row
+            if not pending:
+                return
+
+def _scan_entries(data):
+    """
+    Scans a log buffer (bytes or mmap) and returns the entries that take part
+    in pairing as (ts_us, keys, is_start) arrays, in log order: every
+    'Setting' (start) within the 30s to 80s window, and the 'Set'
+    (completion) entries.
+    """
+    # The run starts at the first log entry
+    first = next(_iter_entries(data, 0, len(data)), None)
+    if first is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+
+    # Parse every log entry up to the cutoff straight into a structured
+    # array, without building an intermediate list of per-entry tuples
+    cutoff = _find_cutoff_offset(data, 0, _ts_to_us(first[0]) + SCAN_CUTOFF_US)
+    records = np.fromiter(_iter_entries(data, 0, cutoff), dtype=RECORD_DTYPE)
+    ts_us, keys, is_start = _record_columns(records)
+
+    # Only keep 'Setting' (start) entries within the 30s to 80s window, measured
+    # from the first log entry. All 'Set' (completion) entries are kept, so
+    # requests that started inside the window count even if they finish
+    # outside it; completions whose start was dropped are simply never paired.
+    elapsed_us = ts_us - ts_us[0]
+    keep = ~is_start | ((elapsed_us >= WINDOW_START_US) & (elapsed_us < WINDOW_END_US))
+    ts_us, keys, is_start = ts_us[keep], keys[keep], is_start[keep]
+
+    # Requests that started in the window but had not completed by the cutoff
+    # still count, however slow they are. Keep reading completions for just
+    # those until all of them are in, or the log ends.
+    pending = _pending_start_keys(keys, is_start)
+    if pending:
+        late = np.fromiter(_iter_late_completions(data, cutoff, pending), dtype=RECORD_DTYPE)
+        late_ts_us, late_keys, late_is_start = _record_columns(late)
+        ts_us = np.concatenate((ts_us, late_ts_us))
+        keys = np.concatenate((keys, late_keys))
+        is_start = np.concatenate((is_start, late_is_start))
+
+    return ts_us, keys, is_start
+
+def _pair_latencies_numpy(ts_us, keys, is_start):
+    """
+    Pairs each 'Setting' (start) entry with its 'Set' (completion) entry and
+    returns the latencies (ms) of the completed requests. keys holds each
+    entry's packed request id (see _record_columns).
+    Entries are stable-sorted by key, so each key's entries stay in log
+    order. A completion is paired when the entry right before it is a start
+    for the same key. This matches a dict of starts that a later start
+    overwrites and a completion pops: a repeated start replaces the earlier
+    one, and a repeated completion finds nothing left to pair with.
+    """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    ts_us = ts_us[order]
+    is_start = is_start[order]
+
+    paired = (keys[1:] == keys[:-1]) & is_start[:-1] & ~is_start[1:]
+    return (ts_us[1:][paired] - ts_us[:-1][paired]) / 1000.0 # Convert to milliseconds
+
+if njit is not None:
+    # The explicit signature compiles this on import instead of on first
+    # call, and cache=True keeps the compiled code across runs.
+    @njit(types.float64[:](types.int64[:], types.int64[:], types.boolean[:]),
+          cache=True)
+    def _pair_latencies_numba(ts_us, keys, is_start):
+        """
+        Same as _pair_latencies_numpy, as a single compiled pass over the
+        entries in log order. Start timestamps are kept in a typed dict
+        keyed by the packed request id.
+        """
+        request_starts = Dict.empty(key_type=types.int64, value_type=types.int64)
+        latencies_ms = np.empty(len(ts_us), dtype=np.float64)
+        n = 0
+        for i in range(len(ts_us)):
+            key = keys[i]
+            if is_start[i]:
+                request_starts[key] = ts_us[i]
+            elif key in request_starts:
+                latencies_ms[n] = (ts_us[i] - request_starts.pop(key)) / 1000.0
+                n += 1
+        return latencies_ms[:n]
+
+    pair_latencies = _pair_latencies_numba
+else:
+    pair_latencies = _pair_latencies_numpy
+
+def _cache_path(filepath):
+    """
+    Returns the cache file for a log file. It is keyed on CACHE_VERSION, the
+    file's mtime and size, and the analysis window, so changing any of them
+    invalidates it.
+    """
+    stat = os.stat(filepath)
+    cache_key = (f"v{CACHE_VERSION}_{stat.st_mtime_ns}_{stat.st_size}"
+                 f"_{WINDOW_START_US}_{WINDOW_END_US}_{SCAN_CUTOFF_US}")
+    return os.path.join(os.path.dirname(filepath), CACHE_DIR_NAME,
+                        f"{os.path.basename(filepath)}.{cache_key}.npy")
+
+def _save_cache(cache_path, latencies_ms):
+    """Writes latencies to the cache, via a temporary file so a partial write is never loaded."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, latencies_ms)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache file {cache_path}: {e}")
+
+def _clean_stale_cache(log_files):
+    """
+    Removes cache files that do not belong to the current version of any log
+    file, and temporary files left behind by interrupted writes. Failures
+    only print a warning; a stale cache entry is never loaded anyway.
+    """
+    current = set()
+    for path in log_files:
+        try:
+            current.add(_cache_path(path))
+        except OSError:
+            pass # The log file vanished; its cache entries are stale too
+
+    cache_dirs = {os.path.join(os.path.dirname(path), CACHE_DIR_NAME) for path in log_files}
+    for cache_dir in cache_dirs:
+        entries = glob.glob(os.path.join(cache_dir, "*.npy")) + glob.glob(os.path.join(cache_dir, "*.npy.tmp"))
+        for entry in entries:
+            if entry in current:
+                continue
+            try:
+                os.remove(entry)
+            except OSError as e:
+                print(f"Warning: Could not remove stale cache file {entry}: {e}")
 
 def parse_log_file(filepath):
     """
@@ -25,93 +309,48 @@ def parse_log_file(filepath):
     
     rps = int(rps_match.group(1))
     
-    # Regex to capture the key log elements:
-    log_regex = re.compile(
-        r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}Z).*\s+(Client_\d+)\s+\[Req:\s+(\d+)\]\s+(Setting|Set)\s+"
-    )
-    
-    # Store start timestamps: Key is (client_id, req_id)
-    request_starts = {} 
-    latencies_ms = []
-    
-    # New variable to store the absolute start time of the test run
-    run_start_time = None 
-
     print(f"--- Parsing {filename} (Target RPS: {rps}) with 30-80s filter ---")
 
     try:
-        with open(filepath, 'r') as f:
-            for line in f:
-                match = log_regex.search(line)
-                if match:
-                    timestamp_str, client_id, req_id_str, action = match.groups()
-                    
-                    try:
-                        # Convert timestamp string to datetime object
-                        timestamp = datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
-                    except ValueError:
-                        print(f"Error parsing timestamp in line: {line.strip()}. Skipping entry.")
-                        continue
-                    
-                    # --- NEW TIME-WINDOW LOGIC ---
-                    if run_start_time is None:
-                        # Set the absolute start time to the first valid timestamp
-                        run_start_time = timestamp
-                    
-                    # Calculate elapsed time in seconds from the start of the log file
-                    elapsed_time_s = (timestamp - run_start_time).total_seconds()
-                    
-                    # Check if the entry is within the 30s to 80s window
-                    # We will only process requests that START within this window, 
-                    # but allow their 'Set' (completion) entries to be processed 
-                    # even if they fall outside, as long as the 'Setting' (start) 
-                    # entry was recorded.
-                    
-                    # If the entry is too early, skip it.
-                    if elapsed_time_s < 30 and action == "Setting":
-                        continue
-                        
-                    # If the entry is too late, we can stop processing this log file.
-                    # We continue briefly to process any 'Set' entries for requests
-                    # that started just before 80s, but we don't start new ones.
-                    if elapsed_time_s > 85 and action == "Setting":
-                        # We use 85s as a small buffer, but requests starting after 80s 
-                        # are the main target for exclusion. 
-                        # A better check is to only record 'Setting' if < 80s
-                        pass # The logic below handles this better
-                    # --- END OF NEW TIME-WINDOW LOGIC ---
-
-                    req_id = int(req_id_str)
-                    key = (client_id, req_id)
-
-                    if action == "Setting":
-                        # Only record the start if it is within the desired window (0-80s)
-                        if elapsed_time_s < 80:
-                            request_starts[key] = timestamp
-                    
-                    elif action == "Set":
-                        # This is the completion of a request
-                        if key in request_starts:
-                            start_time = request_starts.pop(key)
-                            latency = (timestamp - start_time).total_seconds() * 1000 # Convert to milliseconds
-                            latencies_ms.append(latency)
-                        # Else: the start of the request wasn't captured (likely because it
-                        # occurred before 30s or was too late, or was simply missed), ignore the end.
+        # Reuse the latencies from an earlier run if the file has not changed
+        cache_path = _cache_path(filepath)
+        if os.path.exists(cache_path):
+            latencies_ms = np.load(cache_path)
+            print(f"{filename}: Found {len(latencies_ms)} completed requests within the 30-80s window (cached).")
+            return rps, latencies_ms
 
+        # Map the file instead of reading it: the regex runs directly on the
+        # mapped pages, with no copy, and pages that are not needed past the
+        # cutoff are never read.
+        with open(filepath, 'rb') as f:
+            # An empty file cannot be mapped, and has no entries anyway
+            if os.fstat(f.fileno()).st_size == 0:
+                ts_us, keys, is_start = _scan_entries(b'')
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    ts_us, keys, is_start = _scan_entries(data)
     except FileNotFoundError:
         print(f"Error: File not found at {filepath}")
         return None, []
     except Exception as e:
         print(f"An unexpected error occurred while processing {filepath}: {e}")
         return None, []
-        
-    print(f"Found {len(latencies_ms)} completed requests within the 30-80s window.")
+
+    if len(ts_us) == 0:
+        print(f"{filename}: Found 0 completed requests within the 30-80s window.")
+        return rps, np.empty(0)
+
+    latencies_ms = pair_latencies(ts_us, keys, is_start)
+    _save_cache(cache_path, latencies_ms)
+
+    print(f"{filename}: Found {len(latencies_ms)} completed requests within the 30-80s window.")
     return rps, latencies_ms
 
 def generate_latency_graph(performance_data):
     """
     Generates a Latency vs. Throughput (RPS) graph.
-    performance_data is a dictionary of {RPS: average_latency_ms}.
+    performance_data is a dictionary of
+    {RPS: (average_latency_ms, p50_ms, p95_ms, p99_ms)}.
     """
     if not performance_data:
         print("No valid data found to generate a graph.")
@@ -121,44 +360,49 @@ def generate_latency_graph(performance_data):
     # Sort the data by RPS for a clean graph
     sorted_data = sorted(performance_data.items())
     
-    # Unzip the sorted data into two lists
+    # Unzip the sorted data into one list per series
     throughputs = [item[0] for item in sorted_data]
-    avg_latencies = [item[1] for item in sorted_data]
+    avg_latencies = [item[1][0] for item in sorted_data]
+    p50_latencies = [item[1][1] for item in sorted_data]
+    p95_latencies = [item[1][2] for item in sorted_data]
+    p99_latencies = [item[1][3] for item in sorted_data]
 
     # 2. Create the plot
-    plt.figure(figsize=(10, 6))
+    fig, ax = plt.subplots(figsize=(10, 6))
     
     # Plot the line graph (Using a marker helps show the data points clearly)
-    plt.plot(throughputs, avg_latencies, marker='o', linestyle='-', color='indigo', linewidth=2, markersize=8)
+    ax.plot(throughputs, avg_latencies, 'o-', color='indigo', linewidth=2, markersize=8, label='Average')
+    
+    # Percentiles as thinner dashed lines, to show the tail behind the average
+    ax.plot(throughputs, p50_latencies, '.--', color='seagreen', linewidth=1.5, label='p50')
+    ax.plot(throughputs, p95_latencies, '.--', color='darkorange', linewidth=1.5, label='p95')
+    ax.plot(throughputs, p99_latencies, '.--', color='firebrick', linewidth=1.5, label='p99')
     
     # Add labels and title
-    plt.title('Average Request Latency vs. System Throughput', fontsize=16, pad=20)
-    plt.xlabel('Throughput (Requests per Second - RPS)', fontsize=14)
-    plt.ylabel('Average Latency (ms)', fontsize=14)
+    ax.set_title('Request Latency vs. System Throughput', fontsize=16, pad=20)
+    ax.set_xlabel('Throughput (Requests per Second - RPS)', fontsize=14)
+    ax.set_ylabel('Latency (ms)', fontsize=14)
+    ax.legend(fontsize=12)
     
     # Add grid for readability
-    plt.grid(True, linestyle='--', alpha=0.6)
+    ax.grid(True, linestyle='--', alpha=0.6)
     
     # Annotate each point with its average latency
     for rps, lat in zip(throughputs, avg_latencies):
-        plt.annotate(f'{lat:.2f} ms', 
-                     (rps, lat), 
-                     textcoords="offset points", 
-                     xytext=(5,-15), 
-                     ha='center',
-                     fontsize=10)
+        ax.annotate(f'{lat:.2f} ms', (rps, lat), textcoords="offset points", xytext=(5, -15), ha='center', fontsize=10)
 
     # Set axes limits to start from 0 for better representation
-    plt.xlim(xmin=0)
-    plt.ylim(ymin=0)
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
 
     # Enhance tick appearance
-    plt.xticks(throughputs) # Ensure only the measured RPS values are shown on the axis
+    ax.set_xticks(throughputs) # Ensure only the measured RPS values are shown on the axis
     
-    # Show the plot
-    plt.tight_layout()
-    print("\nSuccessfully generated the graph.")
-    plt.show()
+    # Save the plot
+    fig.tight_layout()
+    fig.savefig(GRAPH_OUTPUT_PATH, dpi=120)
+    plt.close(fig)
+    print(f"\nSuccessfully generated the graph: {GRAPH_OUTPUT_PATH}")
 
 def main():
     """Main function to find files, parse them, and generate the final plot."""
@@ -171,25 +415,33 @@ def main():
         print("Please ensure your log files (e.g., logfile_10rps.log) are in the same folder as this script.")
         return
 
-    # Dictionary to store {RPS: [latency1, latency2, ...]}
+    _clean_stale_cache(log_files)
+
+    # Dictionary to store {RPS: [latencies_file1, latencies_file2, ...]},
+    # one numpy array per log file
     all_performance_data = defaultdict(list)
     
-    for file_path in log_files:
-        rps, latencies = parse_log_file(file_path)
-        
-        if rps is not None and latencies:
-            all_performance_data[rps].extend(latencies)
-
-    # Calculate average latency for each RPS
-    average_performance_data = {}
-    for rps, latencies in all_performance_data.items():
-        if latencies:
-            avg_latency = sum(latencies) / len(latencies)
-            average_performance_data[rps] = avg_latency
-            print(f"RPS {rps}: Average Latency = {avg_latency:.2f} ms ({len(latencies)} samples)")
+    # Each file is independent, so parse them in parallel, one per process
+    with multiprocessing.Pool(min(len(log_files), os.cpu_count() or 1)) as pool:
+        for rps, latencies in pool.imap_unordered(parse_log_file, log_files):
+            if rps is not None and len(latencies):
+                all_performance_data[rps].append(latencies)
+
+    # Calculate average and percentile latencies for each RPS
+    latency_stats = {}
+    for rps, latency_arrays in sorted(all_performance_data.items()):
+        # Join the per-file arrays with a single copy
+        latencies = np.concatenate(latency_arrays)
+        if len(latencies):
+            avg_latency = float(latencies.mean())
+            p50, p95, p99 = (float(p) for p in np.percentile(latencies, [50, 95, 99]))
+            latency_stats[rps] = (avg_latency, p50, p95, p99)
+            print(f"RPS {rps}: Average Latency = {avg_latency:.2f} ms, "
+                  f"p50 = {p50:.2f} ms, p95 = {p95:.2f} ms, p99 = {p99:.2f} ms "
+                  f"({len(latencies)} samples)")
         
     # Generate the plot
-    generate_latency_graph(average_performance_data)
+    generate_latency_graph(latency_stats)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analyze_results as ar  # noqa: E402
+
+BACKENDS = [pytest.param(ar._pair_latencies_numpy, id="numpy")]
+if hasattr(ar, "_pair_latencies_numba"):
+    BACKENDS.append(pytest.param(ar._pair_latencies_numba, id="numba"))
+else:
+    BACKENDS.append(pytest.param(None, id="numba", marks=pytest.mark.skip(reason="numba not installed")))
+
+# The original line-by-line parser's pattern, used as the reference below
+BASELINE_REGEX = re.compile(
+    r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}Z).*\s+(Client_\d+)\s+\[Req:\s+(\d+)\]\s+(Setting|Set)\s+"
+)
+
+
+def baseline_latencies(filepath):
+    """Latencies (ms) as computed by the original dict-based parse_log_file."""
+    request_starts = {}
+    latencies_ms = []
+    run_start = None
+    with open(filepath, 'r') as f:
+        for line in f:
+            match = BASELINE_REGEX.search(line)
+            if not match:
+                continue
+            timestamp_str, client_id, req_id_str, action = match.groups()
+            timestamp = datetime.strptime(timestamp_str, "%Y-%m-%dT%H:%M:%S.%fZ")
+            if run_start is None:
+                run_start = timestamp
+            elapsed_s = (timestamp - run_start).total_seconds()
+            key = (client_id, int(req_id_str))
+            if action == "Setting":
+                if 30 <= elapsed_s < 80:
+                    request_starts[key] = timestamp
+            elif key in request_starts:
+                latencies_ms.append((timestamp - request_starts.pop(key)).total_seconds() * 1000)
+    return np.sort(np.array(latencies_ms))
+
+
+def dict_pair(ts_us, keys, is_start):
+    """Reference pairing: a dict of starts, overwritten by starts and popped by completions."""
+    request_starts = {}
+    latencies_ms = []
+    for ts, key, start in zip(ts_us.tolist(), keys.tolist(), is_start.tolist()):
+        if start:
+            request_starts[key] = ts
+        elif key in request_starts:
+            latencies_ms.append((ts - request_starts.pop(key)) / 1000.0)
+    return np.sort(np.array(latencies_ms))
+
+
+def write_log(path, seed=7, rps=20, duration_s=100):
+    """
+    Writes a synthetic client log: noise lines, a run that crosses midnight,
+    and a few requests started near the end of the window that take far
+    longer than the scan cutoff slack to complete.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 10, 14, 23, 59, 30)
+    lines = [(-1.0, "reactor_nctrl listening on port 3000\n")]
+    req = [0] * 4
+    t = 0.0
+    while t < duration_s:
+        t += rng.expovariate(rps)
+        client = rng.randrange(4)
+        req[client] += 1
+        if 74 < t < 80 and rng.random() < 0.1:
+            latency = rng.uniform(5.5, 17)
+        else:
+            latency = rng.uniform(0.001, 0.4)
+        name = f"Client_{client} [Req: {req[client]}]"
+        lines.append((t, f"INFO epaxos::client: {name} Setting k{client} = v\n"))
+        lines.append((t + 0.0001, "DEBUG epaxos::epaxos::handlers: PreAccept cmd Set(k,v) [Req: 3]\n"))
+        lines.append((t + latency, f"INFO epaxos::client: {name} Set k{client} = v\n"))
+    lines.sort(key=lambda line: line[0])
+    with open(path, 'w') as f:
+        for t, line in lines:
+            if t >= 0:
+                f.write((start + timedelta(seconds=t)).strftime("%Y-%m-%dT%H:%M:%S.%fZ") + "  ")
+            f.write(line)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_parse_log_file_matches_baseline(tmp_path, monkeypatch, backend):
+    path = tmp_path / "logfile_20rps.log"
+    write_log(path)
+    monkeypatch.setattr(ar, "pair_latencies", backend)
+
+    rps, latencies = ar.parse_log_file(str(path))
+
+    expected = baseline_latencies(path)
+    assert rps == 20
+    # Requests that complete long after the scan cutoff still count
+    assert expected.max() > (ar.SCAN_CUTOFF_US - ar.WINDOW_END_US) / 1000.0
+    np.testing.assert_allclose(np.sort(latencies), expected)
+
+
+# (timestamps in us, keys, is_start) in log order
+PAIRING_CASES = {
+    "duplicate_completion": ([0, 10, 20], [1, 1, 1], [True, False, False]),
+    "restarted_after_completion": ([0, 10, 20], [1, 1, 1], [True, False, True]),
+    "reused_key": ([0, 10, 20, 40], [1, 1, 1, 1], [True, False, True, False]),
+    "repeated_start": ([0, 10, 30], [1, 1, 1], [True, True, False]),
+    "completion_stamped_before_start": ([10, 0], [1, 1], [True, False]),
+    "completion_without_start": ([0, 10, 20], [2, 1, 1], [False, True, False]),
+    "interleaved_keys": ([0, 5, 10, 30, 50], [1, 2, 1, 2, 1], [True, True, False, False, False]),
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("case", sorted(PAIRING_CASES))
+def test_pairing_matches_dict_semantics(backend, case):
+    ts_us, keys, is_start = PAIRING_CASES[case]
+    ts_us = np.array(ts_us, dtype=np.int64)
+    keys = np.array(keys, dtype=np.int64)
+    is_start = np.array(is_start, dtype=bool)
+
+    latencies = backend(ts_us, keys, is_start)
+
+    np.testing.assert_allclose(np.sort(latencies), dict_pair(ts_us, keys, is_start))
+
+
+def test_parse_log_file_empty_and_missing(tmp_path):
+    empty = tmp_path / "logfile_5rps.log"
+    empty.write_bytes(b"")
+    no_entries = tmp_path / "logfile_6rps.log"
+    no_entries.write_bytes(b"no client entries here\n")
+
+    assert ar.parse_log_file(str(empty))[0] == 5
+    assert len(ar.parse_log_file(str(empty))[1]) == 0
+    assert len(ar.parse_log_file(str(no_entries))[1]) == 0
+    assert ar.parse_log_file(str(tmp_path / "logfile_7rps.log")) == (None, [])
+
+
+def test_cache_reuse_and_cleanup(tmp_path, capsys):
+    path = tmp_path / "logfile_20rps.log"
+    write_log(path)
+    cache_dir = tmp_path / ar.CACHE_DIR_NAME
+
+    _, parsed = ar.parse_log_file(str(path))
+    _, cached = ar.parse_log_file(str(path))
+    assert "(cached)" in capsys.readouterr().out
+    np.testing.assert_array_equal(parsed, cached)
+
+    current = ar._cache_path(str(path))
+    stale = cache_dir / "logfile_20rps.log.v0_1_2_3_4_5.npy"
+    orphan = cache_dir / (os.path.basename(current) + ".tmp")
+    stale.write_bytes(b"")
+    orphan.write_bytes(b"")
+
+    ar._clean_stale_cache([str(path)])
+
+    assert sorted(os.listdir(cache_dir)) == [os.path.basename(current)]
+
+
+def test_entry_matching_follows_line_regex(tmp_path):
+    start = datetime(2025, 10, 14, 12, 0, 0)
+    lines = [
+        (0, "Client_0 [Req: 1] Setting k = v"),
+        (40, "Client_2 [Req: 1] Setting k = v"),
+        # Not preceded by whitespace, so not an entry
+        (40.5, "FooClient_2 [Req: 1] Set k = v"),
+        (41, "Client_2 [Req: 1] Set k = v"),
+        # Only the last entry on a line counts
+        (42, "Client_3 [Req: 1] Setting k = v, relayed as Client_4 [Req: 1] Setting k = v"),
+        (43, "Client_3 [Req: 1] Set k = v"),
+        (44, "Client_4 [Req: 1] Set k = v"),
+    ]
+    path = tmp_path / "logfile_1rps.log"
+    with open(path, 'w') as f:
+        for t, line in lines:
+            ts = (start + timedelta(seconds=t)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            f.write(f"{ts}  INFO epaxos::client: {line}\n")
+
+    _, latencies = ar.parse_log_file(str(path))
+
+    np.testing.assert_allclose(baseline_latencies(path), [1000.0, 2000.0])
+    np.testing.assert_allclose(np.sort(latencies), baseline_latencies(path))